@@ -1,12 +1,88 @@
+import contextlib
+import io
 import os
-from configparser import ConfigParser, SectionProxy
+import re
+import shutil
+import tempfile
+from configparser import DEFAULTSECT, RawConfigParser, SectionProxy
 from datetime import datetime, timezone
-from typing import Optional, Union
+from typing import NamedTuple, Optional, Union
 
 DEFAULT_REGION = "eu-west-1"
 
+# The AWS credentials and config files are expected to be in the default location
+# The actual paths depend on the platform, and are resolved once at import time
+_CREDENTIALS_FILE_PATH = os.path.join(os.path.expanduser("~"), ".aws", "credentials")
+_CONFIG_FILE_PATH = os.path.join(os.path.expanduser("~"), ".aws", "config")
 
-class AwsConfigParser(ConfigParser):
+# Parsed credentials files, keyed by path. Each entry holds the modification time
+# and size (st_mtime_ns, st_size) of the file when it was parsed, and its sections
+# as plain dicts. The size is compared as well, because on filesystems with coarse
+# timestamps a rewrite may not change the modification time.
+_CONFIG_CACHE: dict[str, tuple[tuple[int, int], dict[str, dict[str, str]]]] = {}
+
+
+def _file_version(path: str) -> tuple[int, int]:
+    """The modification time and size of a file, which identify its cached contents"""
+    stat_result = os.stat(path)
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+# A "key = value" (or "key: value") line in the credentials file
+_OPTION_PATTERN = re.compile(r"(?P<key>[^=:]+?)\s*[=:]\s*(?P<value>.*)")
+
+
+def _parse_aws_credentials(path: str) -> Union[dict[str, dict[str, str]], None]:
+    """
+    Parse the AWS credentials file with a minimal line based parser, which
+    supports [section] headers, "key = value" settings, comments and empty lines.
+    Return None if the file cannot be read or contains anything else (such as
+    multi-line values, duplicates or empty section names), in which case the
+    file should be read by ConfigParser instead.
+    """
+    sections: dict[str, dict[str, str]] = {}
+    # The options of the current section, which is defined once a section header is read
+    section: dict[str, str]
+    try:
+        with open(path, encoding="UTF-8") as file:
+            lines = file.readlines()
+    except (OSError, UnicodeDecodeError):
+        return None
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped[0] in "#;":
+            continue
+        if line[0].isspace():
+            return None
+        if stripped[0] == "[" and stripped[-1] == "]":
+            # ConfigParser does not accept an empty section name
+            if not (name := stripped[1:-1]) or name in sections:
+                return None
+            section = sections[name] = {}
+        elif sections and (match := _OPTION_PATTERN.fullmatch(stripped)):
+            if (key := match["key"].lower()) in section:
+                return None
+            section[key] = match["value"]
+        else:
+            return None
+    return sections
+
+
+class AwsCredentials(NamedTuple):
+    """The credentials from a profile, together with the AWS region to use them in"""
+
+    access_key_id: Union[str, None]
+    secret_access_key: Union[str, None]
+    session_token: Union[str, None]
+    region: Union[str, None]
+
+
+# The settings of both profiles are exposed as separate properties, and the
+# section accessors of RawConfigParser are overridden to read the file lazily.
+# The snapshots of the parsed profiles are kept in separate attributes, so that
+# reading a setting takes a single attribute access and dict lookup.
+# pylint: disable-next=too-many-public-methods,too-many-instance-attributes
+class AwsConfigParser(RawConfigParser):
     """
     Class for easy interaction with the AWS credentials file.
 
@@ -25,11 +101,25 @@ class AwsConfigParser(ConfigParser):
           properties for programmatic access
         - A temporary profile that is expired is considered to not exist
         - Store a new temporary profile (credentials need to be provided)
+
+    The credentials file is read on first use of any of the profile properties,
+    or of has_section, sections and item access, not when the class is
+    initialized. The base profile is validated at that time as well.
     """
 
     def __init__(self, profile_name: str, default_region: Optional[str] = None) -> None:
         super().__init__()
-        self._read_config()
+        self._credentials_file_path = _CREDENTIALS_FILE_PATH
+        self._parsed = False
+        # The resolved profile sections are cached, and invalidated whenever the
+        # profile name changes or a new temporary profile is stored. The settings
+        # of the base and temporary profiles are also kept as plain dicts, so
+        # reading a setting does not involve the ConfigParser machinery.
+        # self._profile_cache is None as long as these snapshots have not been taken.
+        self._profile_cache = None
+        self._profile_dict = {}
+        self._temp_profile_dict = None
+        self._temp_profile_expiration_dt = None
         # self._profile_name is the local variable holding the profile name String
         # self.profile_name is the class property that validates the new profile
         self._profile_name = ""
@@ -51,8 +141,12 @@ class AwsConfigParser(ConfigParser):
                 "class is initialized."
             )
         self._profile_name = value
-        # This will generate an exception in case the profile does not exist
-        _ = self.credentials_profile.name
+        self._profile_cache = None
+        # Validating the profile requires the credentials file. If it has not been
+        # read yet, the validation is deferred until the file is read on first use.
+        if self._parsed:
+            # This will generate an exception in case the profile does not exist
+            self._snapshot_profiles()
 
     @property
     def temp_profile_name(self) -> str:
@@ -75,29 +169,26 @@ class AwsConfigParser(ConfigParser):
         """
         return (
             region
-            if (region := self.credentials_profile.get("aws_region", None)) is not None
+            if (region := self._profile_settings.get("aws_region")) is not None
             else self._default_region
         )
 
-
-    def _credentials_file(self) -> str:
-        # The AWS credentials file is expected to be in the default location
-        # The actual path depends on the platform
-        return os.path.join(os.path.expanduser("~"), ".aws", "credentials")
-
     @property
     def _config_file(self) -> str:
-        # The AWS config file is expected to be in the default location
-        # The actual path depends on the platform
-        return os.path.join(os.path.expanduser("~"), ".aws", "config")
+        return _CONFIG_FILE_PATH
 
     @property
     def credentials_profile(self) -> Union[SectionProxy, None]:
         """The base profile that has been read from the credentials file."""
-        return self._read_profile(
-            profile_name=self._profile_name,
-            allow_missing_profile=False,
-        )
+        if self._profile_cache is None:
+            self._ensure_parsed()
+        return self._profile_cache
+
+    @property
+    def _profile_settings(self) -> dict[str, str]:
+        if self._profile_cache is None:
+            self._ensure_parsed()
+        return self._profile_dict
 
     @property
     def config_profile(self) -> Union[SectionProxy, None]:
@@ -105,10 +196,10 @@ class AwsConfigParser(ConfigParser):
         Any additional settings for the base profile that have been read from
         the config file.
         """
+        self._ensure_parsed()
         config_profile_name = f"profile {self._profile_name}"
-        return self._read_profile(
-            profile_name=config_profile_name,
-            allow_missing_profile=True,
+        return (
+            self[config_profile_name] if self.has_section(config_profile_name) else None
         )
 
     @property
@@ -117,30 +208,35 @@ class AwsConfigParser(ConfigParser):
         The temporary profile as read from the credentials file. Returns
         None if the temporary profile does not exist or is expired.
         """
-        return self._read_profile(
-            profile_name=self.temp_profile_name,
-            allow_missing_profile=True,
+        return (
+            self[self.temp_profile_name]
+            if self.valid_temp_profile_exists
+            else None
         )
 
+    @property
+    def _valid_temp_profile_dict(self) -> Union[dict[str, str], None]:
+        return self._temp_profile_dict if self.valid_temp_profile_exists else None
+
     @property
     def profile_access_key_id(self) -> Union[str, None]:
         """The aws_access_key_id from the base profile"""
-        return self._get_setting(self.credentials_profile, "aws_access_key_id")
+        return self._get_setting(self._profile_settings, "aws_access_key_id")
 
     @property
     def profile_secret_access_key(self) -> Union[str, None]:
         """The aws_secret_access_key from the base profile"""
-        return self._get_setting(self.credentials_profile, "aws_secret_access_key")
+        return self._get_setting(self._profile_settings, "aws_secret_access_key")
 
     @property
     def profile_mfa_serial(self) -> Union[str, None]:
         """The mfa_serial from the base profile"""
-        return self._get_setting(self.credentials_profile, "mfa_serial")
+        return self._get_setting(self._profile_settings, "mfa_serial")
 
     @property
     def profile_mfa_key(self) -> Union[str, None]:
         """The mfa_key from the base profile"""
-        return self._get_setting(self.credentials_profile, "mfa_key")
+        return self._get_setting(self._profile_settings, "mfa_key")
 
     @property
     def profile_mfa_is_configured(self) -> bool:
@@ -152,95 +248,182 @@ class AwsConfigParser(ConfigParser):
 
     @property
     def valid_temp_profile_exists(self) -> bool:
-        return self.temp_profile is not None
+        if self._profile_cache is None:
+            self._ensure_parsed()
+        # The expiration date is parsed once when the snapshot is taken, so only
+        # the comparison with the current time is done on every access
+        return self._temp_profile_dict is not None and (
+            self._temp_profile_expiration_dt is None
+            or self._temp_profile_expiration_dt >= datetime.now(timezone.utc)
+        )
 
     @property
     def temp_profile_access_key_id(self) -> Union[str, None]:
         """The aws_access_key_id from the temporary profile"""
-        return self._get_setting(self.temp_profile, "aws_access_key_id")
+        return self._get_setting(self._valid_temp_profile_dict, "aws_access_key_id")
 
     @property
     def temp_profile_secret_access_key(self) -> Union[str, None]:
-        return self._get_setting(self.temp_profile, "aws_secret_access_key")
+        return self._get_setting(self._valid_temp_profile_dict, "aws_secret_access_key")
 
     @property
     def temp_profile_session_token(self) -> Union[str, None]:
-        return self._get_setting(self.temp_profile, "aws_session_token")
+        return self._get_setting(self._valid_temp_profile_dict, "aws_session_token")
 
     @property
     def temp_profile_expiration(self) -> Union[datetime, None]:
-        expiration_date = self._get_setting(self.temp_profile, "expiration_utc")
         return (
-            datetime.fromisoformat(expiration_date)
-            if expiration_date is not None
+            self._temp_profile_expiration_dt
+            if self.valid_temp_profile_exists
             else None
         )
 
+    def profile_credentials(self) -> AwsCredentials:
+        """The credentials from the base profile, and the AWS region"""
+        profile = self._profile_settings
+        return AwsCredentials(
+            access_key_id=profile.get("aws_access_key_id"),
+            secret_access_key=profile.get("aws_secret_access_key"),
+            session_token=None,
+            region=self.aws_region,
+        )
+
+    def temp_credentials(self) -> AwsCredentials:
+        """
+        The credentials from the temporary profile, and the AWS region. The
+        credentials are None if no valid temporary profile exists.
+        """
+        profile = self._valid_temp_profile_dict or {}
+        return AwsCredentials(
+            access_key_id=profile.get("aws_access_key_id"),
+            secret_access_key=profile.get("aws_secret_access_key"),
+            session_token=profile.get("aws_session_token"),
+            region=self.aws_region,
+        )
+
     @staticmethod
-    def _is_expired(date_string_utc: str) -> bool:
-        datetime_utc = (
+    def _parse_expiration(date_string_utc: Union[str, None]) -> Union[datetime, None]:
+        return (
             datetime.fromisoformat(date_string_utc)
             if date_string_utc is not None
             else None
         )
-        return (
-            datetime_utc < datetime.now(timezone.utc)
-            if datetime_utc is not None
-            else True
-        )
 
     def _read_config(self) -> None:
         """
-        Read the AWS configuration from both credentials file. Raise an exception
+        Read the AWS configuration from the credentials file. Raise an exception
         in case the credentials file does not exist. Also raise an exception in
         case the credentials file does not contain any sections (profiles).
+
+        The parsed file is cached for the process. As long as the file is not
+        modified, other instances are populated from the cache instead of
+        parsing the file again. The file is parsed by _parse_aws_credentials,
+        and only by ConfigParser if it is not a plain credentials file.
         """
-        if not os.path.exists(self._credentials_file):
+        try:
+            file_version = _file_version(self._credentials_file_path)
+        except FileNotFoundError as exc:
             raise RuntimeError(
-                f"AWS Credentials file {self._credentials_file} does not exist"
-            )
-        self.read(self._credentials_file)
+                f"AWS Credentials file {self._credentials_file_path} does not exist"
+            ) from exc
+        cached = _CONFIG_CACHE.get(self._credentials_file_path)
+        if cached is not None and cached[0] == file_version:
+            self.read_dict(cached[1])
+        else:
+            if (sections := _parse_aws_credentials(self._credentials_file_path)) is not None:
+                self.read_dict(sections)
+            else:
+                self.read(self._credentials_file_path)
+            _CONFIG_CACHE[self._credentials_file_path] = (file_version, self._sections_dict())
         # The ConfigParser.read() method reads all existing files in the iterable.
         # Files that cannot be opened are silently ignored.
-        if not self.sections():
+        if not super().sections():
             raise RuntimeError(
-                f"AWS Credentials File {self._credentials_file} does not contain any sections"
+                f"AWS Credentials File {self._credentials_file_path} does not contain any sections"
             )
 
-    def _read_profile(
-        self, profile_name: str, allow_missing_profile: bool
-    ) -> Union[SectionProxy, None]:
+    def _ensure_parsed(self) -> None:
         """
-        Return the profile section from the configuration.
-        If the profile does not exist:
-            - If allow_missing_profile is True: return None.
-            - If allow_missing_profile is False: raise a RuntimeError exception.
-        If the profile exists:
-            - If an expiration date exists in the profile (expiration_utc) and
-              is in the past: return None
-            - If an expiration date does not exist in the profile, or if an
-              expiration date exists and is in the future: return the profile
+        Read the credentials file and take the snapshots of the base and
+        temporary profiles, if this has not been done yet.
         """
-        profile = None
-        if self.has_section(profile_name):
-            profile = (
-                None
-                if "expiration_utc" in (section := self[profile_name]).keys()
-                and self._is_expired(section.get("expiration_utc"))
-                else section
-            )
-        if profile is None and not allow_missing_profile:
+        if not self._parsed:
+            self._read_config()
+            self._parsed = True
+        if self._profile_cache is None:
+            self._snapshot_profiles()
+
+    # The sections of the configuration are only available after the credentials
+    # file has been read. The file is read on first access, like the profile
+    # properties. Once it has been read, the methods only delegate to
+    # RawConfigParser, so they can be used while the snapshots are taken.
+    def has_section(self, section: str) -> bool:
+        if not self._parsed:
+            self._ensure_parsed()
+        return super().has_section(section)
+
+    def sections(self) -> list[str]:
+        if not self._parsed:
+            self._ensure_parsed()
+        return super().sections()
+
+    def __getitem__(self, key: str) -> SectionProxy:
+        if not self._parsed:
+            self._ensure_parsed()
+        return super().__getitem__(key)
+
+    def _read_base_profile(self, profile_name: str) -> SectionProxy:
+        """
+        Return the base profile section from the configuration. Raise a
+        RuntimeError exception if the profile does not exist. The base profile
+        holds long-term credentials, so it is not checked for expiration.
+        """
+        if not self.has_section(profile_name):
             raise RuntimeError(
-                f"AWS Credentials file {self._credentials_file} "
+                f"AWS Credentials file {self._credentials_file_path} "
                 f"does not contain profile {profile_name}"
             )
-        return profile
+        return self[profile_name]
+
+    def _read_temp_profile(
+        self, temp_profile_name: str
+    ) -> tuple[Union[dict[str, str], None], Union[datetime, None]]:
+        """
+        Return the settings of the temporary profile and its parsed expiration
+        date (expiration_utc). Return None for both if the profile does not exist.
+        Whether the profile is expired is checked when it is used, by comparing
+        the expiration date with the current time.
+        """
+        if not self.has_section(temp_profile_name):
+            return None, None
+        settings = dict(self.items(temp_profile_name))
+        return settings, self._parse_expiration(settings.get("expiration_utc"))
+
+    def _sections_dict(self) -> dict[str, dict[str, str]]:
+        """All sections of the configuration (including the defaults) as plain dicts"""
+        return {
+            DEFAULTSECT: dict(self._defaults),
+            **{section: dict(options) for section, options in self._sections.items()},
+        }
+
+    def _snapshot_profiles(self) -> None:
+        """
+        Copy the settings of the base profile and the temporary profile into
+        plain dicts, and parse the expiration date of the temporary profile.
+        Raise an exception in case the base profile does not exist.
+        """
+        self._profile_cache = self._read_base_profile(self._profile_name)
+        self._profile_dict = dict(self.items(self._profile_cache.name))
+        (
+            self._temp_profile_dict,
+            self._temp_profile_expiration_dt,
+        ) = self._read_temp_profile(self.temp_profile_name)
 
     @staticmethod
     def _get_setting(
-        profile: SectionProxy, setting_name: str
+        profile: Union[dict[str, str], None], setting_name: str
     ) -> Union[str, bool, None]:
-        return profile.get(setting_name, None) if profile is not None else None
+        return profile.get(setting_name) if profile is not None else None
 
     def _get_profile_setting(self, setting_name: str) -> Union[str, bool, None]:
         setting_value = (
@@ -261,13 +444,53 @@ class AwsConfigParser(ConfigParser):
         # This method is designed to directly accept the Credentials section from the STS
         # get_session_token response, which is in snake case
         # pylint: disable=invalid-name
-        self[self.temp_profile_name] = {}  # add new profile or clear existing profile
-        temp_profile = self[self.temp_profile_name]
-        temp_profile["aws_access_key_id"] = AccessKeyId
-        temp_profile["aws_secret_access_key"] = SecretAccessKey
-        temp_profile["aws_session_token"] = SessionToken
-        temp_profile["expiration_utc"] = datetime.isoformat(Expiration)
-        with open(
-            file=self._credentials_file, mode="wt", encoding="UTF-8"
-        ) as configfile:
-            self.write(configfile)
+        # Add a new profile or replace the existing profile in a single update
+        temp_profile_name = self.temp_profile_name
+        self[temp_profile_name] = {
+            "aws_access_key_id": AccessKeyId,
+            "aws_secret_access_key": SecretAccessKey,
+            "aws_session_token": SessionToken,
+            "expiration_utc": datetime.isoformat(Expiration),
+        }
+        # Write to a temporary file first and then replace the credentials file,
+        # so the credentials file is never left truncated if writing fails
+        # The configuration is serialized in memory first, so the file is written
+        # with a single system call instead of one call per line
+        buffer = io.StringIO()
+        self.write(buffer)
+        data = memoryview(buffer.getvalue().encode("UTF-8"))
+        # A symlinked credentials file is resolved, so that the link is kept and
+        # its target is updated
+        credentials_file_path = os.path.realpath(self._credentials_file_path)
+        # mkstemp creates a uniquely named file that is only accessible by the
+        # current user, so concurrent writers do not share it and the credentials
+        # are not readable by others while the file is written
+        file_descriptor, temp_file_path = tempfile.mkstemp(
+            dir=os.path.dirname(credentials_file_path), prefix=".credentials-", suffix=".tmp"
+        )
+        try:
+            try:
+                # os.write writes all data at once to a regular file, unless it is
+                # interrupted. In that case the remaining data is written again.
+                while data:
+                    data = data[os.write(file_descriptor, data) :]
+                os.fsync(file_descriptor)
+            finally:
+                os.close(file_descriptor)
+            # Keep the permissions of the credentials file
+            shutil.copymode(credentials_file_path, temp_file_path)
+            os.replace(temp_file_path, credentials_file_path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_file_path)
+            raise
+        # Refresh the cached contents of the credentials file, so other instances
+        # do not need to parse the file that was just written
+        _CONFIG_CACHE[self._credentials_file_path] = (
+            _file_version(self._credentials_file_path),
+            self._sections_dict(),
+        )
+        # Only the temporary profile has changed. Its snapshot is updated
+        # directly, and the expiration date does not need to be parsed again.
+        self._temp_profile_dict = dict(self.items(temp_profile_name))
+        self._temp_profile_expiration_dt = Expiration
@@ -1,14 +1,152 @@
-from typing import Optional, Union
+# boto3 and botocore are imported where they are used, so importing this
+# module is fast and their import cost is only paid when a session is used
+# pylint: disable=import-outside-toplevel
+from __future__ import annotations
 
-import boto3
-import pyotp
-from botocore.config import Config
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Optional, Union
 
 from .aws_config_parser import AwsConfigParser
 from .aws_role_session_config import AwsRoleSessionConfig
 
+if TYPE_CHECKING:
+    import boto3
+    import botocore.session
+    from botocore.config import Config
 
+# Creating a boto3 client is expensive, so STS clients are shared across all
+# AwsRoleSession instances in the process, keyed by the credentials and region
+_STS_CLIENT_CACHE: dict[tuple, boto3.client] = {}
+_STS_CLIENT_CACHE_LOCK = threading.Lock()
+# The boto3 session that creates the STS clients, see _sts_session()
+_STS_SESSION: Optional[boto3.Session] = None
+# The maximum number of roles that are assumed concurrently by AwsRoleSession.warm()
+MAX_WARM_WORKERS = 16
+# An assumed role session is renewed when it expires within this margin
+ROLE_SESSION_REFRESH_MARGIN = timedelta(seconds=60)
+# The temporary profile is renewed when it expires within this margin, well
+# before its credentials are rejected by STS
+TEMP_PROFILE_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def _expires_soon(expiration: Optional[datetime], margin: timedelta) -> bool:
+    """Whether credentials with the given expiration date are (almost) expired"""
+    return expiration is not None and expiration <= datetime.now(timezone.utc) + margin
+
+
+def _decode_mfa_key(mfa_key: str) -> bytes:
+    """Decode the base32 encoded MFA secret key, which may lack its padding"""
+    return base64.b32decode(mfa_key + "=" * (-len(mfa_key) % 8), casefold=True)
+
+
+def _totp(key: bytes) -> str:
+    """
+    Generate the current Time-based One Time Password (RFC 6238) for the given
+    secret key, using a 30 second interval, 6 digits and SHA-1 like AWS MFA does
+    """
+    counter = int(time.time()) // 30
+    digest = hmac.new(key, counter.to_bytes(8, "big"), hashlib.sha1).digest()
+    offset = digest[-1] & 0x0F
+    code = int.from_bytes(digest[offset : offset + 4], "big") & 0x7FFFFFFF
+    return f"{code % 1_000_000:06d}"
+
+
+def _sts_endpoints_configured(botocore_session: botocore.session.Session) -> bool:
+    """
+    Whether the STS endpoints to use are configured explicitly, with the
+    AWS_STS_REGIONAL_ENDPOINTS environment variable or the sts_regional_endpoints
+    setting of the profile in the AWS config file
+    """
+    if "AWS_STS_REGIONAL_ENDPOINTS" in os.environ:
+        return True
+    from botocore.exceptions import ProfileNotFound
+
+    try:
+        return "sts_regional_endpoints" in botocore_session.get_scoped_config()
+    except ProfileNotFound:
+        return False
+
+
+def _sts_session() -> boto3.Session:
+    """
+    The boto3 session that creates the STS clients. It uses the regional STS
+    endpoints (sts.<region>.amazonaws.com) instead of the global endpoint, which
+    older botocore versions use for many regions. An explicitly configured
+    AWS_STS_REGIONAL_ENDPOINTS environment variable or sts_regional_endpoints
+    setting in the AWS config file takes precedence.
+    Must be called while holding _STS_CLIENT_CACHE_LOCK.
+    """
+    global _STS_SESSION  # pylint: disable=global-statement
+    if _STS_SESSION is None:
+        import boto3
+        import botocore.session
+
+        botocore_session = botocore.session.get_session()
+        if not _sts_endpoints_configured(botocore_session):
+            botocore_session.set_config_variable("sts_regional_endpoints", "regional")
+        _STS_SESSION = boto3.Session(botocore_session=botocore_session)
+    return _STS_SESSION
+
+
+def _cached_sts_client(
+    aws_access_key_id: str,
+    aws_secret_access_key: str,
+    aws_session_token: Optional[str],
+    region_name: Optional[str],
+) -> boto3.client:
+    """
+    Obtain an STS client for the given credentials, reusing a previously created
+    client if one exists for the same credentials and region
+    """
+    key = (aws_access_key_id, aws_session_token, region_name)
+    with _STS_CLIENT_CACHE_LOCK:
+        if (client := _STS_CLIENT_CACHE.get(key)) is None:
+            client = _STS_CLIENT_CACHE[key] = _sts_session().client(
+                service_name="sts",
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                aws_session_token=aws_session_token,
+                region_name=region_name,
+            )
+    return client
+
+
+# The STS client, the role sessions, the clients and their locks are each kept
+# in their own slot, so that they can be read without an extra indirection
+# pylint: disable-next=too-many-instance-attributes
 class AwsRoleSession:
+    # The configuration that is read from the configuration file is shared by
+    # all instances, so the file is read and validated only once per process
+    _shared_config: Optional[AwsRoleSessionConfig] = None
+    _shared_config_lock = threading.Lock()
+
+    __slots__ = (
+        "_config",
+        "_role_name",
+        "_aws_config_parser",
+        "_use_mfa",
+        "_base_sts_client_object",
+        "_sts_client_object",
+        "_sts_client_key",
+        "_sts_expiration",
+        "_totp_key",
+        "_role_sessions",
+        "_clients",
+        "_sts_lock",
+        "_session_locks",
+        "_session_locks_guard",
+        "_retry_config_object",
+        "_session_duration",
+        "_role_session_duration",
+    )
+
     def __init__(
         self,
         profile_name: Optional[str] = None,
@@ -16,7 +154,7 @@ class AwsRoleSession:
         use_mfa: Optional[bool] = None,
         configuration: Optional[dict] = None,
     ) -> None:
-        self._config = AwsRoleSessionConfig(configuration)
+        self._config = self._get_config(configuration)
         self._role_name = (
             role_name if role_name is not None else self._config.default_role
         )
@@ -25,35 +163,108 @@ class AwsRoleSession:
         )
         self._aws_config_parser = AwsConfigParser(profile)
         self._use_mfa = use_mfa if use_mfa is not None else self._config.default_use_mfa
+        self._base_sts_client_object = None
         self._sts_client_object = None
-        self._role_sessions = []
+        self._sts_client_key = None
+        self._sts_expiration: Optional[datetime] = None
+        self._totp_key: Optional[bytes] = None
+        self._role_sessions: dict[str, tuple[datetime, boto3.Session]] = {}
+        # Clients are cached per (account name, service name), for as long as the
+        # role session of the account is valid. Resources are not cached, because
+        # boto3 resources are not thread safe.
+        self._clients: dict[tuple[str, str], boto3.client] = {}
+        # The STS client and the temporary profile are guarded by one lock, and
+        # the role session (and cached clients) of each account by its own lock,
+        # so concurrent threads do not assume the same role more than once
+        self._sts_lock = threading.RLock()
+        self._session_locks: dict[str, threading.RLock] = {}
+        self._session_locks_guard = threading.Lock()
+        # These settings are used for every client, resource and session token,
+        # so they are looked up in the configuration only once. The retry
+        # configuration is created on first use, see _retry_config.
+        self._retry_config_object: Optional[Config] = None
+        self._session_duration = self._config.session_duration
+        self._role_session_duration = self._config.role_session_duration
+
+    @classmethod
+    def _get_config(cls, configuration: Optional[dict]) -> AwsRoleSessionConfig:
+        """
+        Provide the configuration. An explicitly passed configuration is used
+        as is, otherwise the shared configuration from the configuration file
+        is returned.
+        """
+        if configuration is not None:
+            return AwsRoleSessionConfig(configuration)
+        with cls._shared_config_lock:
+            if cls._shared_config is None:
+                config = AwsRoleSessionConfig()
+                # Load the configuration file now, so a failure is raised here
+                # and no invalid configuration is shared
+                _ = config.configuration
+                cls._shared_config = config
+        return cls._shared_config
 
     @property
     def _retry_config(self) -> Config:
-        return Config(
-            retries={
-                "max_attempts": self._config.max_retry_attempts,
-                "mode": "standard",
-            }
-        )
+        if self._retry_config_object is None:
+            from botocore.config import Config
+
+            self._retry_config_object = Config(
+                retries={
+                    "max_attempts": self._config.max_retry_attempts,
+                    "mode": "standard",
+                }
+            )
+        return self._retry_config_object
 
     def get_client(self, account_name: str, service_name: str) -> boto3.client:
         """
         Obtain a client for a given service in the given account
         """
-        return self._role_session(account_name).client(
-            service_name=service_name,
-            config=self._retry_config,
-        )
+        with self._session_lock(account_name):
+            # The role session is obtained first, because renewing it discards
+            # the cached clients of the account
+            session = self._role_session(account_name)
+            key = (account_name, service_name)
+            if (client := self._clients.get(key)) is None:
+                client = self._clients[key] = session.client(
+                    service_name=service_name,
+                    config=self._retry_config,
+                )
+        return client
 
     def get_resource(self, account_name: str, service_name: str) -> boto3.resource:
         """
-        Obtain a resource for a given service in the given account
+        Obtain a new resource for a given service in the given account
         """
-        return self._role_session(account_name).resource(
-            service_name=service_name,
-            config=self._retry_config,
-        )
+        # The resource is created under the lock of the account, like the
+        # clients, so the role session is not used by several threads at once
+        with self._session_lock(account_name):
+            return self._role_session(account_name).resource(
+                service_name=service_name,
+                config=self._retry_config,
+            )
+
+    def warm(self, account_names: list[str]) -> None:
+        """
+        Assume the roles in the given accounts concurrently, so that subsequent
+        calls to get_client and get_resource for these accounts do not have to
+        wait for AssumeRole one account at a time
+
+        Args:
+            account_names (list[str]): The accounts in which the roles are assumed
+        """
+        if not account_names:
+            return
+        # The temporary profile is updated first, in the calling thread, since
+        # this may require the user to enter an MFA One Time Password
+        _ = self._sts_client
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_WARM_WORKERS, len(account_names))
+        ) as executor:
+            # Consume the results, so that any exception is raised here
+            for _ in executor.map(self._role_session, account_names):
+                pass
 
     @property
     def _sts_client(self) -> boto3.client:
@@ -62,21 +273,60 @@ class AwsRoleSession:
         authenticated session). This client is used to assume remote roles.
         """
         # We want to create a new STS client if it does not exist, but also if the
-        # underlying temporary profile has expired after the client was created
-        if (
-            self._sts_client_object is None
-            or self._aws_config_parser.temp_profile is None
-        ):
-            self.update_temp_profile()
-            self._sts_client_object = boto3.client(
-                service_name="sts",
-                aws_access_key_id=self._aws_config_parser.temp_profile_access_key_id,
-                aws_secret_access_key=self._aws_config_parser.temp_profile_secret_access_key,
-                aws_session_token=self._aws_config_parser.temp_profile_session_token,
-                region_name=self._aws_config_parser.aws_region,
-            )
+        # underlying temporary profile has expired after the client was created.
+        # The expiration date of the temporary profile is kept with the client,
+        # so the check does not need to consult the credentials file.
+        # The check is repeated after acquiring the lock, because another thread
+        # may have created the client in the meantime.
+        if self._sts_client_outdated():
+            with self._sts_lock:
+                if self._sts_client_outdated():
+                    self.update_temp_profile()
+                    credentials = self._aws_config_parser.temp_credentials()
+                    self._sts_expiration = self._aws_config_parser.temp_profile_expiration
+                    self._sts_client_key = (
+                        credentials.access_key_id,
+                        credentials.session_token,
+                        credentials.region,
+                    )
+                    self._sts_client_object = _cached_sts_client(
+                        aws_access_key_id=credentials.access_key_id,
+                        aws_secret_access_key=credentials.secret_access_key,
+                        aws_session_token=credentials.session_token,
+                        region_name=credentials.region,
+                    )
         return self._sts_client_object
 
+    @property
+    def _base_sts_client(self) -> boto3.client:
+        """
+        The STS client based on the base profile. This client is used to obtain
+        the session token for the temporary profile. The base profile holds
+        long-term credentials, so the client is kept for the lifetime of the
+        instance.
+        """
+        if self._base_sts_client_object is None:
+            credentials = self._aws_config_parser.profile_credentials()
+            self._base_sts_client_object = _cached_sts_client(
+                aws_access_key_id=credentials.access_key_id,
+                aws_secret_access_key=credentials.secret_access_key,
+                aws_session_token=credentials.session_token,
+                region_name=credentials.region,
+            )
+        return self._base_sts_client_object
+
+    def _sts_client_outdated(self) -> bool:
+        return self._sts_client_object is None or _expires_soon(
+            self._sts_expiration, TEMP_PROFILE_REFRESH_MARGIN
+        )
+
+    def _session_lock(self, account_name: str) -> threading.RLock:
+        """The lock that guards the role session and cached clients of an account"""
+        with self._session_locks_guard:
+            if (lock := self._session_locks.get(account_name)) is None:
+                lock = self._session_locks[account_name] = threading.RLock()
+        return lock
+
     def _role_session(self, account_name: str) -> boto3.Session:
         """
         _role_session provides the boto3 Session object that represents the
@@ -92,27 +342,32 @@ class AwsRoleSession:
         # To avoid that a new session is created unnecessarily, for example when
         # multiple clients or resources are created in the same account, any
         # session that is created is stored in a variable together with the
-        # account name.
-        # Note that all sessions have a lifetime of 3600 seconds. It is assumed
-        # that this code will never run that long so there is no check whether
-        # a session has already expired.
-        # if session := self._existing_role_session(account_name) is None:
-        #    session = self._get_role_session(account_name)
-        # return session
+        # account name and its expiration date. A session that is about to
+        # expire is replaced by a new one. The check is repeated after acquiring
+        # the lock of the account, because another thread may have created the
+        # session in the meantime.
+        if (session := self._existing_role_session(account_name)) is None:
+            with self._session_lock(account_name):
+                if (session := self._existing_role_session(account_name)) is None:
+                    expiration, session = self._get_role_session(account_name)
+                    self._role_sessions[account_name] = (expiration, session)
+                    self._discard_clients(account_name)
+        return session
+
+    def _discard_clients(self, account_name: str) -> None:
+        """Remove the cached clients that belong to an account"""
+        # Other threads may add clients of other accounts, so iterate over a copy
+        for key in [key for key in list(self._clients) if key[0] == account_name]:
+            del self._clients[key]
+
+    def _existing_role_session(self, account_name: str) -> Union[boto3.Session, None]:
+        if (item := self._role_sessions.get(account_name)) is None:
+            return None
+        expiration, session = item
         return (
             session
-            if (session := self._existing_role_session(account_name)) is not None
-            else self._get_role_session(account_name)
-        )
-
-    def _existing_role_session(self, account_name):
-        return next(
-            (
-                item["session"]
-                for item in self._role_sessions
-                if item["account"] == account_name
-            ),
-            None,
+            if expiration - datetime.now(timezone.utc) >= ROLE_SESSION_REFRESH_MARGIN
+            else None
         )
 
     def _otp(self) -> str:
@@ -121,37 +376,48 @@ class AwsRoleSession:
         base profile, the OTP will be generated automatically. Otherwise, the
         user is asked to enter the OTP manually.
         """
+        # The MFA key is decoded once, and reused for every renewal of the
+        # temporary profile
+        if self._totp_key is None and self._aws_config_parser.profile_mfa_is_configured:
+            self._totp_key = _decode_mfa_key(self._aws_config_parser.profile_mfa_key)
         return (
-            pyotp.TOTP(self._aws_config_parser.profile_mfa_key).now()
-            if self._aws_config_parser.profile_mfa_is_configured
+            _totp(self._totp_key)
+            if self._totp_key is not None
             else input("Enter MFA One Time Password: ")
         )
 
     def update_temp_profile(self) -> None:
         """
         Update the temporary profile in the credentials file in case it does
-        not exist or is expired
+        not exist, is expired or is about to expire
         """
-        # _aws_config_parser.temp_profile will be None if the profile does not
-        # exist or is expired
-        if self._aws_config_parser.temp_profile is None:
-            base_sts_client = boto3.client(
-                service_name="sts",
-                region_name=self._aws_config_parser.aws_region,
-                aws_access_key_id=self._aws_config_parser.profile_access_key_id,
-                aws_secret_access_key=self._aws_config_parser.profile_secret_access_key,
-            )
-            session_token_config = {"DurationSeconds": self._config.session_duration}
+        with self._sts_lock:
+            self._update_temp_profile()
+
+    def _update_temp_profile(self) -> None:
+        # _aws_config_parser.valid_temp_profile_exists will be False if the
+        # profile does not exist or is expired
+        parser = self._aws_config_parser
+        if not parser.valid_temp_profile_exists or _expires_soon(
+            parser.temp_profile_expiration, TEMP_PROFILE_REFRESH_MARGIN
+        ):
+            # The client for the previous (expired) temporary credentials will
+            # never be used again
+            if self._sts_client_key is not None:
+                with _STS_CLIENT_CACHE_LOCK:
+                    _STS_CLIENT_CACHE.pop(self._sts_client_key, None)
+                self._sts_client_key = None
+            session_token_config = {"DurationSeconds": self._session_duration}
             if self._use_mfa:
                 session_token_config.update(
                     {
-                        "SerialNumber": self._aws_config_parser.profile_mfa_serial,
+                        "SerialNumber": parser.profile_mfa_serial,
                         "TokenCode": self._otp(),
                     }
                 )
 
-            result = base_sts_client.get_session_token(**session_token_config)
-            self._aws_config_parser.store_temp_profile(**result["Credentials"])
+            result = self._base_sts_client.get_session_token(**session_token_config)
+            parser.store_temp_profile(**result["Credentials"])
 
     def _get_role(self, account_name: str) -> Union[str, None]:
         return (
@@ -160,7 +426,7 @@ class AwsRoleSession:
             else self._role_name
         )
 
-    def _get_role_session(self, account_name: str) -> boto3.Session:
+    def _get_role_session(self, account_name: str) -> tuple[datetime, boto3.Session]:
         """Assume a role in the given account and use it to open a session
 
         Args:
@@ -169,27 +435,28 @@ class AwsRoleSession:
                                 aws_role_session.toml configuration file.
 
         Returns:
-            Session: A new boto3 Session object under the assumed role in the
-            given account
+            Tuple: The expiration date of the assumed role credentials, and a new
+            boto3 Session object under the assumed role in the given account
         """
         role_credentials = self._sts_client.assume_role(
             RoleArn=self._role_to_assume(account_name),
             RoleSessionName=f"assume-{account_name}",
-            DurationSeconds=3600,
+            DurationSeconds=self._role_session_duration,
         )
+        import boto3
+
+        credentials = role_credentials["Credentials"]
         result = boto3.Session(
-            aws_access_key_id=role_credentials["Credentials"]["AccessKeyId"],
-            aws_secret_access_key=role_credentials["Credentials"]["SecretAccessKey"],
-            aws_session_token=role_credentials["Credentials"]["SessionToken"],
+            aws_access_key_id=credentials["AccessKeyId"],
+            aws_secret_access_key=credentials["SecretAccessKey"],
+            aws_session_token=credentials["SessionToken"],
             region_name=self._aws_config_parser.aws_region,
         )
-        self._role_sessions.append({"account": account_name, "session": result})
-        return result
+        return credentials["Expiration"], result
 
     def _role_to_assume(self, account_name):
-        account_id = self._config.account_id_for_name(account_name)
         if (role_name := self._get_role(account_name)) is None:
             raise RuntimeError(
                 f"No role was configured for account {account_name}, or passed to the class."
             )
-        return f"arn:aws:iam::{account_id}:role/{role_name}"
+        return self._config.account_role_arn(account_name, role_name)
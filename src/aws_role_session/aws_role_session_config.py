@@ -1,9 +1,13 @@
+# jsonschema and tomllib are imported where they are used, so they are only
+# loaded when a configuration is actually read or validated
+# pylint: disable=import-outside-toplevel
+from __future__ import annotations
+
 import os
-from typing import Any, Optional, Union
+from typing import TYPE_CHECKING, Any, Optional, Union
 
-import toml
-from botocore import configprovider
-from jsonschema import validate
+if TYPE_CHECKING:
+    from jsonschema import Draft7Validator
 
 # Schema to validate the configuration file
 JSON_SCHEMA = {
@@ -41,6 +45,11 @@ JSON_SCHEMA = {
                     "minimum": 900,
                     "maximum": 129600,
                 },
+                "role_session_duration": {
+                    "type": "integer",
+                    "minimum": 900,
+                    "maximum": 43200,
+                },
             },
         },
     },
@@ -51,13 +60,44 @@ JSON_SCHEMA = {
             "additionalProperties": False,
             "properties": {
                 "name": {"type": "string"},
-                "id": {"pattern": "^[0-9]{12}$"},
+                # The format of the id (12 digits) is checked by _validate_account_ids
+                "id": {},
                 "role": {"type": "string"},
                 "category": {"type": "string"},
             },
         }
     },
 }
+# The schema validator is created once. jsonschema.validate() would check the
+# schema and create a new validator for every configuration that is validated.
+_VALIDATOR: Optional[Draft7Validator] = None
+
+
+def _validator() -> Draft7Validator:
+    global _VALIDATOR  # pylint: disable=global-statement
+    if _VALIDATOR is None:
+        import jsonschema
+
+        _VALIDATOR = jsonschema.Draft7Validator(JSON_SCHEMA)
+    return _VALIDATOR
+
+
+def _validate_account_ids(configuration: dict) -> None:
+    """
+    Raise a ValidationError if a configured account id is a string that does not
+    consist of 12 digits. This is checked directly instead of with a regular
+    expression in the schema.
+    """
+    from jsonschema.exceptions import ValidationError
+
+    for account in configuration["settings"]["accounts"]:
+        account_id = account["id"]
+        if isinstance(account_id, str) and not (
+            len(account_id) == 12 and account_id.isascii() and account_id.isdigit()
+        ):
+            raise ValidationError(f"{account_id!r} is not a valid account id")
+
+
 # The name of the configuration file.
 CONFIG_FILE_NAME = "aws_role_session.toml"
 
@@ -65,8 +105,17 @@ CONFIG_FILE_NAME = "aws_role_session.toml"
 class AwsRoleSessionConfig:
     SettingValue = Union[str, int, bool, None]
 
+    __slots__ = ("_configuration", "_config_path", "_by_name", "_by_id", "_role_arns")
+
     def __init__(self, configuration: Optional[dict] = None) -> None:
         self._configuration = None
+        # The configuration file is expected to be im the default AWS CLI configuration directory
+        self._config_path = os.path.join(os.path.expanduser("~"), ".aws", CONFIG_FILE_NAME)
+        # Indexes of the configured accounts by name and by id, built on first use
+        self._by_name = None
+        self._by_id = None
+        # The ARNs of the roles to assume, by account name and role name
+        self._role_arns: dict[tuple[str, str], str] = {}
         self.configuration = configuration
 
     @property
@@ -77,28 +126,52 @@ class AwsRoleSessionConfig:
         but can also be passed as a parameter when the class is initialized.
         """
         if self._configuration is None:
-            self.configuration = toml.load(self._config_path)
+            try:
+                import tomllib
+            except ModuleNotFoundError:  # Python < 3.11
+                import tomli as tomllib
+
+            try:
+                with open(self._config_path, "rb") as config_file:
+                    self.configuration = tomllib.load(config_file)
+            except FileNotFoundError as exc:
+                raise FileNotFoundError(
+                    f"Configuration file {self._config_path} does not exist. The configuration "
+                    "is required and can be specified in this file, or passed as a dict "
+                    "variable when initializing the class."
+                ) from exc
         return self._configuration
 
     @configuration.setter
     def configuration(self, value: dict) -> None:
         if value is not None:
-            # The jsonschema validate function will raise an exception in case
-            # the configuration is not valid
-            validate(value, JSON_SCHEMA)
+            # Raise the same exception as the jsonschema validate function in
+            # case the configuration is not valid
+            from jsonschema.exceptions import best_match
+
+            if (error := best_match(_validator().iter_errors(value))) is not None:
+                raise error
+            _validate_account_ids(value)
         self._configuration = value
+        self._by_name = None
+        self._by_id = None
+        self._role_arns = {}
 
-    @property
-    def _config_path(self) -> str:
-        # The configuration file is expected to be im the default AWS CLI configuration directory
-        result = os.path.join(os.path.expanduser("~"), ".aws", CONFIG_FILE_NAME)
-        if not os.path.exists(result):
-            raise FileNotFoundError(
-                f"Configuration file {result} does not exist. The configuration "
-                "is required and can be specified in this file, or passed as a dict"
-                "variable when initializing the class."
-            )
-        return result
+    def _index_accounts(self) -> None:
+        # The accounts are indexed in reverse order, so that the first account
+        # in the configuration wins in case of duplicate names or ids
+        self._by_name = {account["name"]: account for account in reversed(self.accounts)}
+        self._by_id = {account["id"]: account for account in reversed(self.accounts)}
+
+    def _account_for_name(self, account_name: str) -> dict:
+        if self._by_name is None:
+            self._index_accounts()
+        return self._by_name.get(account_name, {})
+
+    def _account_for_id(self, account_id: str) -> dict:
+        if self._by_id is None:
+            self._index_accounts()
+        return self._by_id.get(account_id, {})
 
     def _get_setting(
         self,
@@ -151,14 +224,7 @@ class AwsRoleSessionConfig:
             Or else the default role if it is configured
             Or else None if neither is configured
         """
-        role = next(
-            (
-                account["role"]
-                for account in self.accounts
-                if account["name"] == account_name and "role" in account
-            ),
-            None,
-        )
+        role = self._account_for_name(account_name).get("role")
         return self.default_role if role is None else role
 
     @property
@@ -177,33 +243,40 @@ class AwsRoleSessionConfig:
         # https://docs.aws.amazon.com/STS/latest/APIReference/API_GetSessionToken.html
         return int(self._get_setting("settings", "session_duration", 43200))
 
+    @property
+    def role_session_duration(self) -> int:
+        """Duration in seconds of the sessions under an assumed role
+
+        This can optionally be configured in the configuration file. The default value is 3600.
+        A longer duration is only accepted if the maximum session duration of the roles allows it.
+        """
+        # The AWS default for the Duration Seconds of AssumeRole is 3600
+        # https://docs.aws.amazon.com/STS/latest/APIReference/API_AssumeRole.html
+        return int(self._get_setting("settings", "role_session_duration", 3600))
+
     def account_category(self, account: str) -> str:
         """Find an account category by either account name or account id"""
-        return next(
-            (
-                acc["category"]
-                for acc in self.accounts
-                if account in (acc["name"], acc["id"]) and "category" in acc
-            ),
-            None,
-        )
+        return (
+            self._account_for_name(account) or self._account_for_id(account)
+        ).get("category")
 
     def account_name_for_id(self, account_id: str) -> str:
-        return next(
-            (
-                account["name"]
-                for account in self.accounts
-                if account["id"] == account_id
-            ),
-            None,
-        )
+        return self._account_for_id(account_id).get("name")
 
     def account_id_for_name(self, account_name: str) -> str:
-        return next(
-            (
-                account["id"]
-                for account in self.accounts
-                if account["name"] == account_name
-            ),
-            None,
-        )
+        return self._account_for_name(account_name).get("id")
+
+    def account_role_arn(self, account_name: str, role_name: str) -> str:
+        """Obtain the ARN of a role in an account.
+
+        Args:
+            account_name (str): The account in which the role exists
+            role_name (str): The name of the role
+
+        Returns:
+            str: The ARN of the role, which is built once per account and role
+        """
+        if (role_arn := self._role_arns.get((account_name, role_name))) is None:
+            role_arn = f"arn:aws:iam::{self.account_id_for_name(account_name)}:role/{role_name}"
+            self._role_arns[(account_name, role_name)] = role_arn
+        return role_arn
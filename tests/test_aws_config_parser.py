@@ -0,0 +1,77 @@
+from configparser import RawConfigParser
+
+import pytest
+
+from aws_role_session import aws_config_parser
+from aws_role_session.aws_config_parser import AwsConfigParser, _parse_aws_credentials
+
+
+def _sections(parser: RawConfigParser) -> dict[str, dict[str, str]]:
+    return {name: dict(parser[name]) for name in parser}
+
+
+SUPPORTED = {
+    "empty": "",
+    "comments and empty lines": "# comment\n; comment\n\n[default]\n\n# aws_region = x\n",
+    "profiles": (
+        "[default]\n"
+        "aws_region = eu-west-1\n"
+        "\n"
+        "[dev]\n"
+        "aws_access_key_id = AKIAEXAMPLE\n"
+        "aws_secret_access_key = abc/def+ghi=\n"
+        "mfa_serial = arn:aws:iam::111111111111:mfa/user\n"
+        "\n"
+        "[temp-dev]\n"
+        "aws_session_token = FwoG//==\n"
+        "expiration_utc = 2023-01-26T12:00:00+00:00\n"
+    ),
+    "colon separator and whitespace": "[dev]\nkey:value\n  \nother   =   spaced value  \n",
+    "empty value": "[dev]\nkey =\n",
+    "mixed case keys": "[Dev]\nAWS_Access_Key_Id = x\n",
+    "inline comment is part of the value": "[dev]\nkey = value # not a comment\n",
+    "defaults section": "[DEFAULT]\naws_region = eu-west-1\n[dev]\nkey = value\n",
+    "section name with spaces and brackets": "[profile dev]\nkey = value\n[a]]\nkey = value\n",
+}
+
+UNSUPPORTED = {
+    "continuation line": "[dev]\nkey = value\n    continued\n",
+    "indented option": "[dev]\n  key = value\n",
+    "duplicate section": "[dev]\nkey = value\n[dev]\nother = value\n",
+    "duplicate option": "[dev]\nkey = value\nKEY = other\n",
+    "option without value": "[dev]\nkey\n",
+    "option before any section": "key = value\n[dev]\n",
+    "empty section name": "[]\nkey = value\n",
+    "unterminated section header": "[dev\nkey = value\n",
+}
+
+
+@pytest.mark.parametrize("content", SUPPORTED.values(), ids=SUPPORTED.keys())
+def test_parse_matches_configparser(tmp_path, content):
+    path = tmp_path / "credentials"
+    path.write_text(content, encoding="UTF-8")
+    expected = RawConfigParser()
+    expected.read(path)
+    parsed = RawConfigParser()
+    parsed.read_dict(_parse_aws_credentials(str(path)))
+    assert _sections(parsed) == _sections(expected)
+
+
+@pytest.mark.parametrize("content", UNSUPPORTED.values(), ids=UNSUPPORTED.keys())
+def test_parse_unsupported_returns_none(tmp_path, content):
+    path = tmp_path / "credentials"
+    path.write_text(content, encoding="UTF-8")
+    assert _parse_aws_credentials(str(path)) is None
+
+
+def test_parse_missing_file_returns_none(tmp_path):
+    assert _parse_aws_credentials(str(tmp_path / "credentials")) is None
+
+
+def test_section_access_reads_the_credentials_file(tmp_path, monkeypatch):
+    path = tmp_path / "credentials"
+    path.write_text("[dev]\naws_access_key_id = AKIAEXAMPLE\n[temp-dev]\n", encoding="UTF-8")
+    monkeypatch.setattr(aws_config_parser, "_CREDENTIALS_FILE_PATH", str(path))
+    assert AwsConfigParser("dev").has_section("dev")
+    assert AwsConfigParser("dev").sections() == ["dev", "temp-dev"]
+    assert AwsConfigParser("dev")["dev"]["aws_access_key_id"] == "AKIAEXAMPLE"
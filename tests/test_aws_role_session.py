@@ -0,0 +1,107 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from moto import mock_aws
+
+from aws_role_session import AwsRoleSession, aws_config_parser, aws_role_session
+from aws_role_session.aws_role_session import _decode_mfa_key, _totp
+
+CONFIGURATION = {
+    "defaults": {"profile_name": "dev", "role_name": "Admin", "use_mfa": False},
+    "settings": {
+        "accounts": [
+            {"name": "a", "id": "111111111111"},
+            {"name": "b", "id": "222222222222"},
+        ]
+    },
+}
+
+
+@pytest.fixture(name="api_calls")
+def fixture_api_calls(tmp_path, monkeypatch):
+    """
+    Mock AWS with a fresh credentials file and STS client cache, and record the
+    STS API calls that are made
+    """
+    credentials_file = tmp_path / "credentials"
+    credentials_file.write_text(
+        "[dev]\n"
+        "aws_access_key_id = AKIAEXAMPLE\n"
+        "aws_secret_access_key = secret\n"
+        "aws_region = eu-west-1\n",
+        encoding="UTF-8",
+    )
+    monkeypatch.setattr(aws_config_parser, "_CREDENTIALS_FILE_PATH", str(credentials_file))
+    monkeypatch.setattr(aws_role_session, "_STS_CLIENT_CACHE", {})
+    monkeypatch.setattr(aws_role_session, "_STS_SESSION", None)
+    calls = []
+    with mock_aws():
+        # Clients copy the event handlers of the session they are created by
+        # pylint: disable=protected-access
+        with aws_role_session._STS_CLIENT_CACHE_LOCK:
+            sts_session = aws_role_session._sts_session()
+        sts_session.events.register(
+            "before-parameter-build.sts",
+            lambda model, params, **kwargs: calls.append((model.name, params.get("RoleArn"))),
+        )
+        yield calls
+
+
+def test_concurrent_get_client_assumes_each_role_once(api_calls):
+    session = AwsRoleSession(configuration=CONFIGURATION)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(
+            executor.map(lambda i: session.get_client("ab"[i % 2], "s3"), range(32))
+        )
+    assert sorted(api_calls) == [
+        ("AssumeRole", "arn:aws:iam::111111111111:role/Admin"),
+        ("AssumeRole", "arn:aws:iam::222222222222:role/Admin"),
+        ("GetSessionToken", None),
+    ]
+    # One client is created and cached per account
+    assert len({id(client) for client in clients}) == 2
+
+
+def test_warm_assumes_each_role_once(api_calls):
+    session = AwsRoleSession(configuration=CONFIGURATION)
+    # Each account is listed several times, so the same role is assumed by
+    # several threads at once
+    session.warm(["a", "b"] * 8)
+    assert sorted(api_calls) == [
+        ("AssumeRole", "arn:aws:iam::111111111111:role/Admin"),
+        ("AssumeRole", "arn:aws:iam::222222222222:role/Admin"),
+        ("GetSessionToken", None),
+    ]
+    # The warmed role sessions are used by subsequent calls
+    session.get_client("a", "s3")
+    session.get_client("b", "s3")
+    assert len(api_calls) == 3
+
+
+def test_warm_without_accounts_does_nothing(api_calls):
+    AwsRoleSession(configuration=CONFIGURATION).warm([])
+    assert not api_calls
+
+
+# The SHA-1 test vectors from RFC 6238, truncated to 6 digits
+@pytest.mark.parametrize(
+    "timestamp, expected",
+    [(59, "287082"), (1111111109, "081804"), (1234567890, "005924"), (2000000000, "279037")],
+)
+def test_totp_rfc6238_vectors(monkeypatch, timestamp, expected):
+    monkeypatch.setattr(time, "time", lambda: timestamp)
+    assert _totp(b"12345678901234567890") == expected
+
+
+@pytest.mark.parametrize(
+    "mfa_key, expected",
+    [
+        ("GEZDGNBVGY3TQOJQGEZDGNBVGY3TQOJQ", b"12345678901234567890"),
+        ("NBUQ====", b"hi"),
+        ("NBUQ", b"hi"),
+        ("nbswy3dpee", b"hello!"),
+    ],
+)
+def test_decode_mfa_key(mfa_key, expected):
+    assert _decode_mfa_key(mfa_key) == expected